@@ -6,38 +6,66 @@ Inspired partly by
   https://protonsforbreakfast.wordpress.com/2024/08/21/2024-summer-summary/
 """
 
+from __future__ import annotations
+
 __author__ = "James Hanlon"
 __version__ = "0.0.1"
 __license__ = "UNLICENSE"
 
 import argparse
-import csv
 import datetime
+import functools
 import logging
-from tabulate import tabulate
-from rich import print
+import math
+import os
+import tempfile
 from dataclasses import dataclass
-from jinja2 import Environment, FileSystemLoader
+from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader
 from pathlib import Path
 from collections import defaultdict
-from typing import Iterator, TypeAlias
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, TypeAlias
 from enum import Enum, auto
 
 
-class Record:
-    def __init__(self):
-        self.DateTime: datetime.datetime = None
-        self.ConsumedElectricalEnergy_Heating: float = None
-        self.ConsumedElectricalEnergy_DomesticHotWater: float = None
-        self.HeatGenerated_Heating: float = None
-        self.HeatGenerated_DomesticHotWater: float = None
-        self.EarnedEnvironmentEnergy_Heating: float = None
-        self.EarnedEnvironmentEnergy_DomesticHotWater: float = None
-        self.DhwTankTemperature: float = None
-        self.OutdoorTemperature: float = None
-        self.ManualModeSetpointHeating: float = None
-        self.RoomTemperatureSetpoint: float = None
-        self.CurrentRoomTemperature: float = None
+def import_dependencies():
+    """
+    Import numpy, pandas and the optional pyarrow, which take most of the
+    start-up time, so that --help and --version do not pay for them.
+    """
+    global np, pd, pa, pacsv
+    import numpy as np
+    import pandas as pd
+
+    try:
+        import pyarrow as pa
+        import pyarrow.csv as pacsv
+    except ImportError:
+        pacsv = None
+
+
+# Metrics held by a dataset, one column each, indexed by DateTime.
+METRICS = [
+    "ConsumedElectricalEnergy_Heating",
+    "ConsumedElectricalEnergy_DomesticHotWater",
+    "HeatGenerated_Heating",
+    "HeatGenerated_DomesticHotWater",
+    "EarnedEnvironmentEnergy_Heating",
+    "EarnedEnvironmentEnergy_DomesticHotWater",
+    "DhwTankTemperature",
+    "OutdoorTemperature",
+    "ManualModeSetpointHeating",
+    "RoomTemperatureSetpoint",
+    "CurrentRoomTemperature",
+]
+
+# Energy metrics which are summed to give totals over a period.
+ENERGY_METRICS = [
+    "ConsumedElectricalEnergy_Heating",
+    "ConsumedElectricalEnergy_DomesticHotWater",
+    "HeatGenerated_Heating",
+    "HeatGenerated_DomesticHotWater",
+]
 
 
 class ChartType(Enum):
@@ -55,14 +83,11 @@ class LineChart:
     def is_type(chart_type: ChartType):
         return chart_type == ChartType.LINE
 
-    def add_label(self, label: str):
-        self.labels.append(label)
-
-    def add_series(self, name: str):
-        self.series[name] = []
+    def add_labels(self, labels: Iterable[str]):
+        self.labels.extend(labels)
 
-    def add_datapoint(self, series_name: str, value: float):
-        self.series[series_name].append(value)
+    def add_series(self, name: str, values: Iterable[float] = ()):
+        self.series[name] = list(values)
 
     def get_symbol(self):
         return self.name.lower().replace(" ", "_").replace("(", "_").replace(")", "_")
@@ -77,11 +102,10 @@ class ScatterChart:
     def is_type(chart_type: ChartType):
         return chart_type == ChartType.SCATTER
 
-    def add_series(self, name: str):
-        self.series[name] = []
-
-    def add_datapoint(self, series_name: str, value: tuple[float, float]):
-        self.series[series_name].append(value)
+    def add_series(self, name: str, values: Iterable[tuple[float, float]] = ()):
+        # Points are held in the form Chart.js expects so a series can be
+        # serialised directly to JSON.
+        self.series[name] = [{"x": x, "y": y} for x, y in values]
 
     def get_symbol(self):
         return self.name.lower().replace(" ", "_").replace("(", "_").replace(")", "_")
@@ -97,102 +121,307 @@ class Stats:
 
 class Dataset:
     def __init__(self):
-        self.records = defaultdict(Record)
-
-    def add(self, date, metric, value):
-        # Set the date.
-        if self.records[date].DateTime == None:
-            self.records[date].DateTime = date
-        # Set the metric.
-        attr_name = metric.replace(":", "_")
-        assert getattr(self.records[date], attr_name) == None, "overwriting data point"
-        setattr(self.records[date], attr_name, value)
-
-    def iter_records(
-        self, date_from: datetime.datetime, date_to: datetime.datetime
-    ) -> Iterator[Record]:
-        for record in self.records.values():
-            if date_from != None and record.DateTime < date_from:
-                continue
-            if date_to != None and record.DateTime > date_to:
-                continue
-            yield record
-
-    def iter_year(self, year: int) -> Iterator[Record]:
-        for record in self.records.values():
-            if record.DateTime.year == year:
-                yield record
-
-    def total(
-        self,
-        year: int,
-        metric: str,
-        date_from: datetime.datetime,
-        date_to: datetime.datetime,
-    ):
-        return sum(
-            getattr(record, metric) if getattr(record, metric) != None else 0
-            for record in self.iter_records(date_from, date_to)
+        self.df = pd.DataFrame(
+            columns=METRICS,
+            index=pd.DatetimeIndex([], name="DateTime"),
+            dtype="float64",
         )
 
-    def total_year(self, year: int, metric: str):
-        return sum(
-            getattr(record, metric) if getattr(record, metric) != None else 0
-            for record in self.iter_year(year)
+    def merge(self, df: pd.DataFrame, check: bool = False):
+        """
+        Merge a DataFrame of metrics indexed by DateTime into the dataset,
+        optionally checking that no existing data points are overwritten.
+        """
+        if check:
+            common = self.df.index.intersection(df.index)
+            overlap = self.df.loc[common, df.columns].notna() & df.loc[common].notna()
+            assert not overlap.values.any(), "overwriting data point"
+        self.df = self.df.combine_first(df)[METRICS].astype("float64").sort_index()
+        self.invalidate()
+
+    def scale(self, metrics: list[str], factor: float):
+        """
+        Scale the values of the specified metrics by a factor.
+        """
+        self.df[metrics] *= factor
+        self.invalidate()
+
+    def invalidate(self):
+        """
+        Drop the cached properties derived from the data.
+        """
+        for name in ("year", "week", "year_groups", "year_totals", "cop"):
+            self.__dict__.pop(name, None)
+
+    @functools.cached_property
+    def year(self):
+        """
+        The year of each row in the dataset.
+        """
+        return self.df.index.year.to_numpy()
+
+    @functools.cached_property
+    def week(self):
+        """
+        The ISO week of each row in the dataset.
+        """
+        return self.df.index.isocalendar().week.to_numpy(dtype=np.int64)
+
+    @functools.cached_property
+    def year_groups(self):
+        """
+        The rows of the dataset grouped by year.
+        """
+        return self.df.groupby(self.year)
+
+    @functools.cached_property
+    def year_totals(self) -> pd.DataFrame:
+        """
+        The totals of the energy metrics for each year, indexed by year.
+        """
+        return self.year_groups[ENERGY_METRICS].sum()
+
+    @functools.cached_property
+    def cop(self) -> pd.DataFrame:
+        """
+        The heating, hot water and combined COP of each row, which are NaN
+        where a reading is missing or the COP is erronious.
+        """
+        consumed_heating = self.df.ConsumedElectricalEnergy_Heating.to_numpy()
+        consumed_water = self.df.ConsumedElectricalEnergy_DomesticHotWater.to_numpy()
+        generated_heating = self.df.HeatGenerated_Heating.to_numpy()
+        generated_water = self.df.HeatGenerated_DomesticHotWater.to_numpy()
+        cop = pd.DataFrame(
+            {
+                "COP_Heating": calculate_cop(generated_heating, consumed_heating),
+                "COP_DomesticHotWater": calculate_cop(generated_water, consumed_water),
+                "COP_Combined": calculate_cop(
+                    generated_heating + generated_water,
+                    consumed_heating + consumed_water,
+                ),
+            },
+            index=self.df.index,
         )
+        # Drop erronious data points with a single mask.
+        return cop.where(cop <= 6)
+
+    def weekly_average(self, values: pd.Series, year: int) -> np.ndarray:
+        """
+        Average a column of the dataset over each ISO week of a year, indexed
+        by week number and ignoring missing values.
+        """
+        values = values.to_numpy()
+        mask = (self.year == year) & ~np.isnan(values)
+        weeks = self.week[mask]
+        sums = np.bincount(weeks, weights=values[mask], minlength=53)
+        # Divide by the number of values in each week, which can be fewer
+        # than seven, leaving weeks with no values as zero.
+        counts = np.bincount(weeks, minlength=53)
+        return np.divide(sums, counts, out=np.zeros_like(sums), where=counts != 0)
+
+    def window(
+        self, date_from: datetime.datetime, date_to: datetime.datetime
+    ) -> pd.DataFrame:
+        """
+        Select the rows between two dates inclusive, either of which can be
+        None. The index is sorted so this is a binary search and a slice.
+        """
+        return self.df.loc[date_from:date_to]
+
+    def totals(
+        self, date_from: datetime.datetime, date_to: datetime.datetime
+    ) -> pd.Series:
+        """
+        The totals of the energy metrics between two dates inclusive.
+        """
+        return self.window(date_from, date_to)[ENERGY_METRICS].sum()
 
     def dump(self):
-        metrics = [
-            "DateTime",
-            "ConsumedElectricalEnergy_Heating",
-            "ConsumedElectricalEnergy_DomesticHotWater",
-            "HeatGenerated_Heating",
-            "HeatGenerated_DomesticHotWater",
-            "EarnedEnvironmentEnergy_Heating",
-            "EarnedEnvironmentEnergy_DomesticHotWater",
-            "DhwTankTemperature",
-            "OutdoorTemperature",
-            "ManualModeSetpointHeating",
-            "RoomTemperatureSetpoint",
-            "CurrentRoomTemperature",
-        ]
-        table = [[getattr(r, x) for x in metrics] for r in self.records.values()]
-        print(tabulate(table, metrics, tablefmt="simple_outline"))
+        print(self.df.to_string())
+
 
+def calculate_cop(generated: np.ndarray, consumed: np.ndarray) -> np.ndarray:
+    """
+    Calculate the coefficient of performance elementwise in a single pass,
+    giving zero where no energy was consumed and NaN where generated is.
+    """
+    out = np.zeros_like(generated)
+    out[np.isnan(generated)] = np.nan
+    return np.divide(generated, consumed, out=out, where=consumed != 0)
 
+
+@functools.lru_cache(maxsize=None)
 def format_kwh(kwh: float) -> str:
 
-    # Define the SI units and their corresponding power of 10 values
-    units = [(1e9, "GWh"), (1e6, "MWh"), (1e3, "kWh"), (1, "Wh")]
+    # Define the SI units, indexed by power of 1000
+    units = ((1, "Wh"), (1e3, "kWh"), (1e6, "MWh"), (1e9, "GWh"))
 
-    # Loop through the units and find the appropriate one
-    for factor, unit in units:
-        if kwh >= factor:
-            value = kwh / factor
-            return f"{value:.2f} {unit}"
+    # If the kWh is too small (or NaN), just return it in Wh
+    if not kwh >= 1:
+        return f"{kwh * 1000:.2f} Wh"
 
-    # If the kWh is too small, just return it in Wh
-    return f"{kwh * 1000:.2f} Wh"
+    # Find the appropriate unit directly from the decade, which infinity
+    # does not have so it takes the largest unit
+    index = len(units) - 1
+    if kwh < math.inf:
+        index = min(int(math.log10(kwh)) // 3, index)
+    # The log can round up to a boundary just below it
+    if kwh < units[index][0]:
+        index -= 1
+    factor, unit = units[index]
+    return f"{kwh / factor:.2f} {unit}"
 
 
-def read_csv(dataset, filename: str, headers: list[str]) -> Dataset:
+def read_header(filename: str) -> tuple[int, list[str]]:
     """
-    Read a CSV file with the specified columns.
+    Read the header of a CSV file, returning the number of comment lines
+    preceding it and its column names.
     """
     with open(filename, "r") as f:
-        contents = csv.reader(f, delimiter=";", quotechar='"')
-        count = 0
-        for row in contents:
-            if row[0].startswith("#") or row[0].startswith("DateTime"):
-                continue
-            # Date
-            date = datetime.datetime.strptime(row[0], "%Y-%m-%d %H:%M:%S")
-            # Values
-            for i in range(1, len(headers)):
-                if row[i] != "":
-                    dataset.add(date, headers[i], float(row[i]))
-            count += 1
-        logging.info(f"Read {count} rows from {filename}")
+        preamble = 0
+        for line in f:
+            if not line.startswith("#"):
+                return preamble, line.rstrip("\n").split(";")
+            preamble += 1
+    raise ValueError(f"no header in {filename}")
+
+
+# Version of the parsed data held in the Parquet caches, which is part of
+# their file names. Increment it when parse_csv changes what it returns.
+CACHE_VERSION = 1
+
+
+def read_csv(filename: str, headers: list[str], check: bool = False) -> pd.DataFrame:
+    """
+    Read a CSV file with the specified columns. When pyarrow is available
+    the parsed data is cached in a Parquet file next to the CSV, which is
+    used instead while it is newer than the CSV and has the same columns
+    and types. Checking the file always parses it.
+    """
+    if not pacsv or check:
+        return parse_csv(filename, headers, check)
+    cache = Path(filename).with_suffix(f".v{CACHE_VERSION}.parquet")
+    metrics = [x.replace(":", "_") for x in headers[1:]]
+    if cache.exists() and cache.stat().st_mtime >= Path(filename).stat().st_mtime:
+        try:
+            df = pd.read_parquet(cache)
+        except (pa.ArrowInvalid, OSError) as e:
+            logging.warning(f"Could not read {cache}: {e}")
+        else:
+            if (
+                sorted(df.columns) == sorted(metrics)
+                and (df.dtypes == "float64").all()
+                and isinstance(df.index, pd.DatetimeIndex)
+            ):
+                logging.info(f"Read {len(df)} rows from {cache}")
+                return df
+    df = parse_csv(filename, headers)
+    # Write to a temporary file and move it into place, so an interrupted
+    # write never leaves a partial cache behind.
+    try:
+        with tempfile.NamedTemporaryFile(
+            dir=cache.parent,
+            prefix=f"{cache.stem}.",
+            suffix=".tmp.parquet",
+            delete=False,
+        ) as f:
+            temp = Path(f.name)
+        try:
+            df.to_parquet(temp, compression="snappy")
+            os.replace(temp, cache)
+        finally:
+            temp.unlink(missing_ok=True)
+    except OSError as e:
+        logging.warning(f"Could not write {cache}: {e}")
+    return df
+
+
+def parse_csv(filename: str, headers: list[str], check: bool = False) -> pd.DataFrame:
+    """
+    Parse a CSV file with the specified columns, using pyarrow if it is
+    available and otherwise the pandas C parser, optionally checking that
+    repeated columns never both hold a value for the same row.
+    """
+    preamble, names = read_header(filename)
+    missing = [x for x in headers if x not in names]
+    if missing:
+        raise ValueError(f"{filename} has no columns {', '.join(missing)}")
+    # Columns are selected by position since the headers can be repeated.
+    columns = [i for i, name in enumerate(names) if name in headers]
+    if pacsv:
+        # Parse a memory-mapped file, which avoids copying it into a Python
+        # buffer first, with blocks of it decoded on Arrow's thread pool.
+        with pa.memory_map(filename, "r") as source:
+            table = pacsv.read_csv(
+                source,
+                read_options=pacsv.ReadOptions(
+                    use_threads=True,
+                    skip_rows=preamble + 1,
+                    column_names=[str(i) for i in range(len(names))],
+                ),
+                parse_options=pacsv.ParseOptions(delimiter=";", quote_char='"'),
+                # Give an explicit schema so no types are inferred, with the
+                # timestamps parsed by Arrow's native ISO 8601 parser.
+                convert_options=pacsv.ConvertOptions(
+                    include_columns=[str(i) for i in columns],
+                    column_types={
+                        str(columns[0]): pa.timestamp("s"),
+                        **{str(i): pa.float64() for i in columns[1:]},
+                    },
+                    null_values=[""],
+                    strings_can_be_null=True,
+                ),
+            )
+            df = table.to_pandas()
+        df.columns = columns
+    else:
+        df = pd.read_csv(
+            filename,
+            sep=";",
+            quotechar='"',
+            # Skip the preamble and header found above rather than checking
+            # every line for a comment.
+            skiprows=preamble + 1,
+            header=None,
+            names=range(len(names)),
+            usecols=columns,
+            dtype={i: "float64" for i in columns[1:]},
+            parse_dates=[0],
+            date_format="%Y-%m-%d %H:%M:%S",
+            cache_dates=True,
+            engine="c",
+        )
+    # Fold repeated columns into one per metric, taking the first value.
+    positions = defaultdict(list)
+    for i in columns[1:]:
+        positions[names[i].replace(":", "_")].append(i)
+    if check:
+        for metric, repeats in positions.items():
+            assert (
+                df[repeats].notna().sum(axis=1) <= 1
+            ).all(), f"overwriting data point for {metric} in {filename}"
+    df = pd.DataFrame(
+        {
+            metric: df[repeats].bfill(axis=1)[repeats[0]]
+            for metric, repeats in positions.items()
+        }
+    ).set_index(pd.DatetimeIndex(df[0], name="DateTime"))
+    logging.info(f"Read {len(df)} rows from {filename}")
+    return df
+
+
+# Template environment shared by every render, which keeps compiled templates
+# in memory and also caches them on disk between runs. Both directories are
+# next to the script so it can be run from anywhere.
+TEMPLATE_DIR = Path(__file__).parent / "templates"
+TEMPLATE_CACHE_DIR = Path(__file__).parent / ".jinja_cache"
+environment = Environment(
+    loader=FileSystemLoader(TEMPLATE_DIR),
+    auto_reload=False,
+    cache_size=-1,
+    bytecode_cache=FileSystemBytecodeCache(TEMPLATE_CACHE_DIR),
+)
+environment.filters["format_kwh"] = format_kwh
 
 
 def generate_html(
@@ -201,10 +430,8 @@ def generate_html(
     total_stats: Stats,
     output_path: Path,
 ):
-    environment = Environment(loader=FileSystemLoader("templates/"))
-    environment.filters["format_kwh"] = format_kwh
-    template = environment.get_template("index.html")
-    content = template.render(
+    TEMPLATE_CACHE_DIR.mkdir(exist_ok=True)
+    content = environment.get_template("index.html").render(
         charts=charts,
         annual_stats=annual_stats,
         total_stats=total_stats,
@@ -218,61 +445,74 @@ def generate_html(
 
 
 def main(args):
-    dataset = Dataset()
+    import_dependencies()
 
+    # Collect the CSV files and their columns.
+    files = []
     for year in [2023, 2024]:
-        # Oddly the colums are repeated for different parts of the dataset.
-        column_repeats = 6 if year == 2023 else 10
-        read_csv(
-            dataset,
-            f"data/{year}/energy_data_{year}_ArothermPlus_21222500100211330001005519N3.csv",
-            [
-                "DateTime",
-            ]
-            + [
-                "ConsumedElectricalEnergy:Heating",
-                "ConsumedElectricalEnergy:DomesticHotWater",
-                "HeatGenerated:Heating",
-                "HeatGenerated:DomesticHotWater",
-                "EarnedEnvironmentEnergy:Heating",
-                "EarnedEnvironmentEnergy:DomesticHotWater",
-            ]
-            * column_repeats,
+        files.append(
+            (
+                f"data/{year}/energy_data_{year}_ArothermPlus_21222500100211330001005519N3.csv",
+                # Oddly the columns are repeated for different parts of the
+                # dataset, these are folded together when read.
+                [
+                    "DateTime",
+                    "ConsumedElectricalEnergy:Heating",
+                    "ConsumedElectricalEnergy:DomesticHotWater",
+                    "HeatGenerated:Heating",
+                    "HeatGenerated:DomesticHotWater",
+                    "EarnedEnvironmentEnergy:Heating",
+                    "EarnedEnvironmentEnergy:DomesticHotWater",
+                ],
+            )
         )
-        read_csv(
-            dataset,
-            f"data/{year}/domestic_hot_water_255_data_{year}.csv",
-            [
-                "DateTime",
-                "DhwTankTemperature",
-            ],
+        files.append(
+            (
+                f"data/{year}/domestic_hot_water_255_data_{year}.csv",
+                [
+                    "DateTime",
+                    "DhwTankTemperature",
+                ],
+            )
         )
-        read_csv(
-            dataset,
-            f"data/{year}/system_data_{year}.csv",
-            ["DateTime", "OutdoorTemperature"],
+        files.append(
+            (
+                f"data/{year}/system_data_{year}.csv",
+                ["DateTime", "OutdoorTemperature"],
+            )
         )
-        read_csv(
-            dataset,
-            f"data/{year}/zone_0_data_{year}.csv",
-            [
-                "DateTime",
-                "ManualModeSetpointHeating",
-                "RoomTemperatureSetpoint",
-                "CurrentRoomTemperature",
-            ],
+        files.append(
+            (
+                f"data/{year}/zone_0_data_{year}.csv",
+                [
+                    "DateTime",
+                    "ManualModeSetpointHeating",
+                    "RoomTemperatureSetpoint",
+                    "CurrentRoomTemperature",
+                ],
+            )
         )
 
+    # Read the files concurrently, since the parsers release the GIL, then
+    # merge them in order.
+    dataset = Dataset()
+    with ThreadPoolExecutor(max_workers=len(files)) as executor:
+        read = functools.partial(read_csv, check=args.debug)
+        for df in executor.map(read, *zip(*files)):
+            dataset.merge(df, check=args.debug)
+
     # Scale the measured Wh values.
-    for record in dataset.records.values():
-        if record.ConsumedElectricalEnergy_Heating:
-            record.ConsumedElectricalEnergy_Heating *= args.scale_consumed
-        if record.ConsumedElectricalEnergy_DomesticHotWater:
-            record.ConsumedElectricalEnergy_DomesticHotWater *= args.scale_consumed
-        if record.HeatGenerated_Heating:
-            record.HeatGenerated_Heating *= args.scale_generated
-        if record.HeatGenerated_DomesticHotWater:
-            record.HeatGenerated_DomesticHotWater *= args.scale_generated
+    dataset.scale(
+        [
+            "ConsumedElectricalEnergy_Heating",
+            "ConsumedElectricalEnergy_DomesticHotWater",
+        ],
+        args.scale_consumed,
+    )
+    dataset.scale(
+        ["HeatGenerated_Heating", "HeatGenerated_DomesticHotWater"],
+        args.scale_generated,
+    )
 
     if args.dump:
         dataset.dump()
@@ -280,165 +520,95 @@ def main(args):
 
     charts = []
 
+    # Select the date range and format its labels once for all the charts.
+    view = dataset.window(args.date_from, args.date_to)
+    view = view.assign(
+        Label=view.index.strftime("%d %m %Y"),
+        **dataset.cop.loc[args.date_from : args.date_to],
+    )
+
     # Prepare consumed chart data.
     chart = LineChart("Energy consumed")
-    chart.add_series("Heating (Wh)")
-    chart.add_series("Hot water (Wh)")
-    chart.add_series("Total (Wh)")
-    for record in dataset.iter_records(args.date_from, args.date_to):
-        if (
-            record.ConsumedElectricalEnergy_Heating != None
-            and record.ConsumedElectricalEnergy_DomesticHotWater != None
-        ):
-            chart.add_label(record.DateTime.strftime("%d %m %Y"))
-            chart.add_datapoint("Heating (Wh)", record.ConsumedElectricalEnergy_Heating)
-            chart.add_datapoint(
-                "Hot water (Wh)",
-                record.ConsumedElectricalEnergy_DomesticHotWater,
-            )
-            chart.add_datapoint(
-                "Total (Wh)",
-                record.ConsumedElectricalEnergy_Heating
-                + record.ConsumedElectricalEnergy_DomesticHotWater,
-            )
+    data = view[
+        [
+            "Label",
+            "ConsumedElectricalEnergy_Heating",
+            "ConsumedElectricalEnergy_DomesticHotWater",
+        ]
+    ].dropna()
+    heating = data.ConsumedElectricalEnergy_Heating
+    water = data.ConsumedElectricalEnergy_DomesticHotWater
+    chart.add_labels(data.Label.tolist())
+    chart.add_series("Heating (Wh)", heating.tolist())
+    chart.add_series("Hot water (Wh)", water.tolist())
+    chart.add_series("Total (Wh)", (heating + water).tolist())
     charts.append(chart)
 
     # Prepare generated chart data.
     chart = LineChart("Heat energy generated")
-    chart.add_series("Heat generated heating (Wh)")
-    chart.add_series("Heat generated hot water (Wh)")
-    for record in dataset.iter_records(args.date_from, args.date_to):
-        if (
-            record.HeatGenerated_Heating != None
-            and record.HeatGenerated_DomesticHotWater != None
-        ):
-            chart.add_label(record.DateTime.strftime("%d %m %Y"))
-            chart.add_datapoint(
-                "Heat generated heating (Wh)", record.HeatGenerated_Heating
-            )
-            chart.add_datapoint(
-                "Heat generated hot water (Wh)", record.HeatGenerated_DomesticHotWater
-            )
+    data = view[
+        ["Label", "HeatGenerated_Heating", "HeatGenerated_DomesticHotWater"]
+    ].dropna()
+    chart.add_labels(data.Label.tolist())
+    chart.add_series("Heat generated heating (Wh)", data.HeatGenerated_Heating.tolist())
+    chart.add_series(
+        "Heat generated hot water (Wh)", data.HeatGenerated_DomesticHotWater.tolist()
+    )
     charts.append(chart)
 
     # Prepare averaged combined COP per week.
-    weekly_cop = {}
-    for year in [2023, 2024]:
-        weekly_cop[year] = [0] * 53
-        for record in dataset.iter_year(year):
-            if (
-                record.ConsumedElectricalEnergy_Heating != None
-                and record.ConsumedElectricalEnergy_DomesticHotWater != None
-                and record.HeatGenerated_Heating != None
-                and record.HeatGenerated_DomesticHotWater != None
-            ):
-                total_consumed = (
-                    record.ConsumedElectricalEnergy_Heating
-                    + record.ConsumedElectricalEnergy_DomesticHotWater
-                )
-                total_generated = (
-                    record.HeatGenerated_Heating + record.HeatGenerated_DomesticHotWater
-                )
-                cop_combined = (
-                    0 if total_consumed == 0 else total_generated / total_consumed
-                )
-                if cop_combined > 6:
-                    # Erronious data point.
-                    continue
-                weekly_cop[year][record.DateTime.isocalendar().week] += cop_combined
-        # Divide sums through for average.
-        weekly_cop[year] = [x / 7 for x in weekly_cop[year]]
+    weekly_cop = {
+        year: dataset.weekly_average(dataset.cop.COP_Combined, year)
+        for year in [2023, 2024]
+    }
 
     # Prepare weekly COP
     chart = LineChart("Weekly averaged COP")
-    for week in range(1, 53):
-        chart.add_label(str(week))
+    chart.add_labels(str(week) for week in range(1, 53))
     for year in [2023, 2024]:
-        chart.add_series(str(year))
-        for x in weekly_cop[year]:
-            chart.add_datapoint(str(year), x)
+        chart.add_series(str(year), weekly_cop[year].tolist())
     charts.append(chart)
 
     # Prepare the COP chart data.
     chart = LineChart("COP")
-    chart.add_series("COP heating")
-    chart.add_series("COP hot water")
-    for record in dataset.iter_records(args.date_from, args.date_to):
-        if (
-            record.ConsumedElectricalEnergy_Heating != None
-            and record.ConsumedElectricalEnergy_DomesticHotWater != None
-            and record.HeatGenerated_Heating != None
-            and record.HeatGenerated_DomesticHotWater != None
-        ):
-            cop_heating = (
-                0
-                if record.ConsumedElectricalEnergy_Heating == 0
-                else record.HeatGenerated_Heating
-                / record.ConsumedElectricalEnergy_Heating
-            )
-            cop_water = (
-                0
-                if record.ConsumedElectricalEnergy_DomesticHotWater == 0
-                else record.HeatGenerated_DomesticHotWater
-                / record.ConsumedElectricalEnergy_DomesticHotWater
-            )
-            if cop_heating > 6 or cop_water > 6:
-                # Erronious data point.
-                continue
-            chart.add_label(record.DateTime.strftime("%d %m %Y"))
-            chart.add_datapoint("COP heating", cop_heating)
-            chart.add_datapoint("COP hot water", cop_water)
+    data = view[["Label", "COP_Heating", "COP_DomesticHotWater"]].dropna()
+    chart.add_labels(data.Label.tolist())
+    chart.add_series("COP heating", data.COP_Heating.tolist())
+    chart.add_series("COP hot water", data.COP_DomesticHotWater.tolist())
     charts.append(chart)
 
     # Prepare the DHW chart data.
     chart = LineChart("Hot water temperature (C)")
-    chart.add_series("DHW")
-    for record in dataset.iter_records(args.date_from, args.date_to):
-        if record.DhwTankTemperature != None:
-            chart.add_label(record.DateTime.strftime("%d %m %Y"))
-            chart.add_datapoint("DHW", record.DhwTankTemperature)
+    data = view[["Label", "DhwTankTemperature"]].dropna()
+    chart.add_labels(data.Label.tolist())
+    chart.add_series("DHW", data.DhwTankTemperature.tolist())
     charts.append(chart)
 
     # Prepare the internal/external temperature chart.
     chart = LineChart("Ambient temperature")
-    chart.add_series("Internal")
-    chart.add_series("External")
-    for record in dataset.iter_records(args.date_from, args.date_to):
-        if record.OutdoorTemperature != None and record.CurrentRoomTemperature != None:
-            chart.add_label(record.DateTime.strftime("%d %m %Y"))
-            chart.add_datapoint("Internal", record.CurrentRoomTemperature)
-            chart.add_datapoint("External", record.OutdoorTemperature)
+    data = view[["Label", "CurrentRoomTemperature", "OutdoorTemperature"]].dropna()
+    chart.add_labels(data.Label.tolist())
+    chart.add_series("Internal", data.CurrentRoomTemperature.tolist())
+    chart.add_series("External", data.OutdoorTemperature.tolist())
     charts.append(chart)
 
     # Prepare chart of heat output vs COP
     chart = ScatterChart("Heat output vs COP averaged weekly")
+    # Collect by year and week for average.
+    total_generated = (
+        dataset.df.HeatGenerated_Heating + dataset.df.HeatGenerated_DomesticHotWater
+    )
+    heat_generated_weekly = {
+        year: dataset.weekly_average(total_generated, year) for year in [2023, 2024]
+    }
     for year in [2023, 2024]:
-
-        # Collect by week.
-        heat_generated_weekly = [0] * 53
-        for record in dataset.iter_year(year):
-            if (
-                record.HeatGenerated_Heating != None
-                and record.HeatGenerated_DomesticHotWater != None
-            ):
-                total_generated = (
-                    record.HeatGenerated_Heating + record.HeatGenerated_DomesticHotWater
-                )
-                heat_generated_weekly[
-                    record.DateTime.isocalendar().week
-                ] += total_generated
-
-        # Divide sums through for average.
-        heat_generated_weekly = [x / 7 for x in heat_generated_weekly]
-
-        chart.add_series(str(year))
-        for week in range(1, 53):
-            cop = weekly_cop[year][week]
-            heat = heat_generated_weekly[week]
-            chart.add_datapoint(
-                str(year),
-                (heat, cop),
-            )
+        chart.add_series(
+            str(year),
+            zip(
+                heat_generated_weekly[year][1:53].tolist(),
+                weekly_cop[year][1:53].tolist(),
+            ),
+        )
     charts.append(chart)
 
     # Prepare year stats.
@@ -451,22 +621,19 @@ def main(args):
         s.scale_generated = args.scale_generated
 
         # Calculate the number of days in the dataset.
-        dates = [x.DateTime for x in dataset.iter_year(year)]
-        diff = max(dates) - min(dates)
+        dates = dataset.year_groups.get_group(year).index
+        diff = dates.max() - dates.min()
         seconds_in_day = 24 * 60 * 60
         s.length_days = diff.days
 
         # Dataset totals.
-        s.annual_heating_consumed = dataset.total_year(
-            year, "ConsumedElectricalEnergy_Heating"
-        )
-        s.annual_water_consumed = dataset.total_year(
-            year, "ConsumedElectricalEnergy_DomesticHotWater"
-        )
-        s.annual_heating_generated = dataset.total_year(year, "HeatGenerated_Heating")
-        s.annual_water_generated = dataset.total_year(
-            year, "HeatGenerated_DomesticHotWater"
+        totals = dataset.year_totals.loc[year]
+        s.annual_heating_consumed = float(totals.ConsumedElectricalEnergy_Heating)
+        s.annual_water_consumed = float(
+            totals.ConsumedElectricalEnergy_DomesticHotWater
         )
+        s.annual_heating_generated = float(totals.HeatGenerated_Heating)
+        s.annual_water_generated = float(totals.HeatGenerated_DomesticHotWater)
 
         # Combined totals.
         s.annual_total_consumed = s.annual_heating_consumed + s.annual_water_consumed
@@ -491,24 +658,17 @@ def main(args):
     s.scale_generated = args.scale_generated
 
     # Calculate the number of days in the dataset.
-    dates = [x.DateTime for x in dataset.iter_records(args.date_from, args.date_to)]
-    diff = max(dates) - min(dates)
+    dates = view.index
+    diff = dates.max() - dates.min()
     seconds_in_day = 24 * 60 * 60
     s.length_days = diff.days
 
     # Dataset totals.
-    s.annual_heating_consumed = dataset.total(
-        year, "ConsumedElectricalEnergy_Heating", args.date_from, args.date_to
-    )
-    s.annual_water_consumed = dataset.total(
-        year, "ConsumedElectricalEnergy_DomesticHotWater", args.date_from, args.date_to
-    )
-    s.annual_heating_generated = dataset.total(
-        year, "HeatGenerated_Heating", args.date_from, args.date_to
-    )
-    s.annual_water_generated = dataset.total(
-        year, "HeatGenerated_DomesticHotWater", args.date_from, args.date_to
-    )
+    totals = dataset.totals(args.date_from, args.date_to)
+    s.annual_heating_consumed = float(totals.ConsumedElectricalEnergy_Heating)
+    s.annual_water_consumed = float(totals.ConsumedElectricalEnergy_DomesticHotWater)
+    s.annual_heating_generated = float(totals.HeatGenerated_Heating)
+    s.annual_water_generated = float(totals.HeatGenerated_DomesticHotWater)
 
     # Combined totals.
     s.annual_total_consumed = s.annual_heating_consumed + s.annual_water_consumed